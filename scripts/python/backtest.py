@@ -2,101 +2,80 @@ import json
 import argparse
 import os
 from typing import Any
+
+import numpy as np
 from substrateinterface import SubstrateInterface  # type: ignore
 from substrateinterface.exceptions import SubstrateRequestException  # type: ignore
 
+from fast_decode import query_map_arrays, query_map_totals, query_map_values
+
 QUERY_URL: str = "wss://bittensor-finney.api.onfinality.io/public"
 STANDARD_MODULE: str = "SubtensorModule"
-SUBNET: int = 0
 DEFAULT_TEMPO = 360
 DEFAULT_START_BLOCK = 3_600_000
 DEFAULT_ITER_EPOCHS = 100
 
 
-def query_map_values(
-    client: SubstrateInterface,
-    module: str,
-    storage_function: str,
-    params: list[Any] = [],
-    block_hash: str | None = None,
-) -> dict[str, Any]:
-    result = client.query_map(  # type: ignore
-        module=module, storage_function=storage_function, params=params, block_hash=block_hash  # type: ignore
-    )
-    return {str(k.value): v.value for k, v in result}  # type: ignore
-
-
-def get_stake(client: SubstrateInterface, block_hash: str) -> dict[str, int]:
-    stake: dict[str, int] = {}
-
+def get_stake(
+    client: SubstrateInterface, subnet: int, block_hash: str
+) -> dict[str, int]:
     all_uids = query_map_values(
         client,
         module=STANDARD_MODULE,
         storage_function="Uids",
-        params=[SUBNET],
+        params=[subnet],
         block_hash=block_hash,
     )
 
     print(f"there are {len(all_uids)} uids")
 
-    counter = 0
-    for hotkey, uid in all_uids.items():
-        counter += 1
-        try:
-            stake_result = query_map_values(
-                client,
-                module=STANDARD_MODULE,
-                storage_function="Stake",
-                params=[hotkey],
-                block_hash=block_hash,
-            )
-            total_stake: int = sum(int(v) for v in stake_result.values())
-            stake[str(uid)] = total_stake
-            if counter % 100 == 0:
-                print(f"Processed {counter} uids")
-        except Exception as e:
-            print(f"Error querying stake for UID {str(uid)}: {str(e)}")
-            stake[str(uid)] = 0
-
-    return stake
-
-
-def get_last_update(client: SubstrateInterface, block_hash: str) -> dict[str, str]:
-    last_update = query_map_values(
+    # `Stake` is keyed by (hotkey, coldkey), read it once and sum per hotkey
+    total_stake = query_map_totals(
+        client, STANDARD_MODULE, "Stake", [], block_hash
+    )
+
+    # uid to total stake of its hotkey
+    return {str(uid): total_stake.get(hotkey, 0) for hotkey, uid in all_uids.items()}
+
+
+def get_last_update(
+    client: SubstrateInterface, subnet: int, block_hash: str
+) -> dict[str, int]:
+    last_update = query_map_arrays(
         client, STANDARD_MODULE, "LastUpdate", [], block_hash
-    )[str(SUBNET)]
+    )[str(subnet)]
 
     # uid to last update value
-    sane_last_update: dict[str, str] = {}
+    sane_last_update: dict[str, int] = {}
 
-    for uid, value in enumerate(last_update):
+    for uid, value in enumerate(np.asarray(last_update).tolist()):
         sane_last_update[str(uid)] = value
 
     return sane_last_update
 
 
 def get_validator_permits(
-    client: SubstrateInterface, block_hash: str
+    client: SubstrateInterface, subnet: int, block_hash: str
 ) -> dict[str, bool]:
-    validator_permits = query_map_values(
+    validator_permits = query_map_arrays(
         client, STANDARD_MODULE, "ValidatorPermit", [], block_hash
-    )[str(SUBNET)]
+    )[str(subnet)]
 
     # uid to validator permit value
     sane_validator_permits: dict[str, bool] = {}
 
-    for uid, value in enumerate(validator_permits):
+    for uid, value in enumerate(np.asarray(validator_permits).tolist()):
         sane_validator_permits[str(uid)] = value
 
     return sane_validator_permits
 
 
 def get_registration_blocks(
-    client: SubstrateInterface, block_hash: str
+    client: SubstrateInterface, subnet: int, block_hash: str
 ) -> dict[str, str]:
 
     registration_blocks = query_map_values(
-        client, STANDARD_MODULE, "BlockAtRegistration", [SUBNET], block_hash
+        client, STANDARD_MODULE, "BlockAtRegistration", [subnet], block_hash
     )
 
     # uid to registration block value
@@ -109,27 +88,29 @@ def get_registration_blocks(
 
 
 def get_epoch_data(
-    client: SubstrateInterface, block_hash: str, later_block_hash: str
+    client: SubstrateInterface, subnet: int, block_hash: str, later_block_hash: str
 ) -> tuple[
-    dict[str, dict[str, list[tuple[int, int]]]],
-    dict[str, str],
+    dict[str, dict[str, list[list[int]]]],
+    dict[str, int],
     dict[str, str],
     dict[str, bool],
 ]:
 
-    weights: dict[str, dict[str, list[tuple[int, int]]]] = {}
+    weights: dict[str, dict[str, list[list[int]]]] = {}
 
-    subnet_weights = query_map_values(
-        client, STANDARD_MODULE, "Weights", [SUBNET], block_hash
+    subnet_weights = query_map_arrays(
+        client, STANDARD_MODULE, "Weights", [subnet], block_hash
     )
-    weights[str(SUBNET)] = {
-        str(uid): [(int(target), int(weight)) for target, weight in w]
+    # `tolist` converts the whole array in C; the generic fallback yields
+    # sequences of pairs, which `np.asarray` brings to the same shape
+    weights[str(subnet)] = {
+        str(uid): np.asarray(w, dtype=np.uint16).reshape(-1, 2).tolist()
         for uid, w in subnet_weights.items()
     }
 
-    last_update = get_last_update(client, later_block_hash)
-    registration_blocks = get_registration_blocks(client, later_block_hash)
-    validator_permits = get_validator_permits(client, later_block_hash)
+    last_update = get_last_update(client, subnet, later_block_hash)
+    registration_blocks = get_registration_blocks(client, subnet, later_block_hash)
+    validator_permits = get_validator_permits(client, subnet, later_block_hash)
 
     return weights, last_update, registration_blocks, validator_permits
 
@@ -177,7 +158,7 @@ def main() -> None:
 
     print("Getting initial stake...")
     start_block_hash = client.get_block_hash(START_BLOCK)
-    data["stake"] = get_stake(client, start_block_hash)
+    data["stake"] = get_stake(client, SUBNET, start_block_hash)
 
     data["weights"] = {}
     data["last_update"] = {}
@@ -188,7 +169,7 @@ def main() -> None:
         block_hash = client.get_block_hash(block_number)
         later_block_hash = client.get_block_hash(block_number + 1)
         weights, last_update, registration_blocks, validator_permits = get_epoch_data(
-            client, block_hash, later_block_hash
+            client, SUBNET, block_hash, later_block_hash
         )
         data["weights"][str(block_number)] = weights
         data["last_update"][str(block_number)] = last_update
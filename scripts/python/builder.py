@@ -10,13 +10,9 @@ import logging
 
 from communex.client import CommuneClient
 
-QUERY_URL = "wss://api.communeai.net"
-STANDARD_MODULE = "SubspaceModule"
-
-EXISTENTIAL_DEPOSIT = 500
-MAX_NAME_LENGTH = 32
+from snapshot import EXISTENTIAL_DEPOSIT, QUERY_URL, assemble_subnets, build_snap
 
-SUDO = "5Dy6aBqv2MQEVpSAKqB147uQUZrAqK18JjFWs2jnzSXHn6Lh"
+STANDARD_MODULE = "SubspaceModule"
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,49 +20,30 @@ logging.basicConfig(level=logging.INFO,
 
 def get_subnets(client: CommuneClient) -> dict[str, Any]:
     logging.info("Fetching subnet information")
-    subnets: dict[Any, Any] = {
-        "subnets": []
-    }
 
     netuids = client.query_map("N", extract_value=False)["N"]
     founder_addys = client.query_map_founder()
     subnet_names = client.query_map_subnet_names()
     stake_froms = client.query_map_stakefrom()
 
-    encountered_names = set()
+    keys: dict[int, dict[int, str]] = {}
+    names: dict[int, dict[int, str]] = {}
+    addresses: dict[int, dict[int, str]] = {}
     for netuid in netuids:
         logging.info(f"Processing subnet with netuid: {netuid}")
-        subnet = {
-            "name": subnet_names[netuid],
-            "founder": founder_addys[netuid],
-            "modules": []
-        }
-        name = subnet_names[netuid]
-
-        keys = client.query_map_key(netuid=netuid)
-        names = client.query_map_name(netuid=netuid)
-        addresses = client.query_map_address(netuid=netuid)
-
-        for index, key in keys.items():
-            name = names[index][:MAX_NAME_LENGTH]
-            if name in encountered_names:
-                continue
-            encountered_names.add(name)
-
-            # Convert the list of tuples to a dictionary
-            stake_from_list = stake_froms.get(key, [])
-            stake_from_dict = {addr: amount for addr, amount in stake_from_list}
-
-            module = {
-                "key": key,
-                "name": name,
-                "address": addresses[index][:MAX_NAME_LENGTH],
-                "stake_from": stake_from_dict
-            }
-            subnet["modules"].append(module)
-
-        subnets["subnets"].append(subnet)
-    return subnets
+        keys[netuid] = client.query_map_key(netuid=netuid)
+        names[netuid] = client.query_map_name(netuid=netuid)
+        addresses[netuid] = client.query_map_address(netuid=netuid)
+
+    # Convert the lists of tuples to dictionaries
+    stake_from_dicts = {
+        key: {addr: amount for addr, amount in stake_from_list}
+        for key, stake_from_list in stake_froms.items()
+    }
+
+    return assemble_subnets(
+        list(netuids), subnet_names, founder_addys, keys, names, addresses, stake_from_dicts
+    )
 
 def get_balances(client: CommuneClient) -> dict[str, dict[str, int]]:
     logging.info("Fetching account balances")
@@ -79,24 +56,6 @@ def get_code(client: CommuneClient) -> dict[str, str]:
     logging.info("Fetching code")
     return {"code": str(client.query(module="Substrate", name="Code"))}
 
-def get_sudo(key: str) -> dict[str, str]:
-    return {"sudo": key}
-
-def build_snap(code: dict[str, str], balances: dict[str, dict[str, int]], subnets: dict[str, Any]) -> dict[str, Any]:
-    """
-    Returns:
-    snapshot spec with keys, in the following order:
-    - sudo: str
-    - balances: dict[str, int]
-    - subnets: dict[str, Any]
-    """
-    spec: dict[str, Any] = {}
-    spec.update(code)
-    spec.update(get_sudo(SUDO))
-    spec.update(balances)
-    spec.update(subnets)
-    return spec
-
 def main():
     parser = argparse.ArgumentParser(
         description="Generate a snapshot of balances and subnets.")
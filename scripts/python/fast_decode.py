@@ -0,0 +1,256 @@
+"""
+Fast-path SCALE decoding of bulk storage maps straight into NumPy arrays
+"""
+from typing import Any, Callable, Collection
+
+import numpy as np
+from numpy.typing import NDArray
+from scalecodec.utils.ss58 import ss58_encode  # type: ignore
+from substrateinterface import SubstrateInterface  # type: ignore
+from substrateinterface.storage import StorageKey  # type: ignore
+
+PAGE_SIZE = 1000
+
+# bytes of the hasher output that precede the raw key, for hashers that keep it
+CONCAT_HASHER_PREFIX: dict[str, int] = {
+    "Identity": 0,
+    "Twox64Concat": 8,
+    "Blake2_128Concat": 16,
+}
+
+# encoded size of the map key types we know how to read back
+KEY_TYPE_SIZES: dict[str, int] = {
+    "u16": 2,
+    "u32": 4,
+    "u64": 8,
+    "AccountId": 32,
+    "AccountId32": 32,
+}
+
+
+def decode_compact(data: bytes, offset: int = 0) -> tuple[int, int]:
+    """
+    Decodes a SCALE compact integer, returning the value and the next offset.
+    """
+    mode = data[offset] & 0b11
+    if mode == 0b00:
+        return data[offset] >> 2, offset + 1
+    if mode == 0b01:
+        return int.from_bytes(data[offset:offset + 2], "little") >> 2, offset + 2
+    if mode == 0b10:
+        return int.from_bytes(data[offset:offset + 4], "little") >> 2, offset + 4
+    length = (data[offset] >> 2) + 4
+    start = offset + 1
+    return int.from_bytes(data[start:start + length], "little"), start + length
+
+
+def decode_vec(data: bytes, dtype: str, width: int = 1) -> NDArray[Any]:
+    """
+    Decodes a `Vec` of fixed-width little-endian elements without
+    materializing per-element Python objects.
+    """
+    length, offset = decode_compact(data)
+    array = np.frombuffer(data, dtype=dtype, count=length * width, offset=offset)
+    return array.reshape(length, width) if width > 1 else array
+
+
+def decode_weights(data: bytes) -> NDArray[np.uint16]:
+    """
+    Decodes `Vec<(u16, u16)>` into an `(n, 2)` array of (target, weight).
+    """
+    return decode_vec(data, "<u2", width=2)
+
+
+def decode_vec_u64(data: bytes) -> NDArray[np.uint64]:
+    return decode_vec(data, "<u8")
+
+
+def decode_vec_bool(data: bytes) -> NDArray[np.bool_]:
+    return decode_vec(data, "?")
+
+
+VEC_DECODERS: dict[str, Callable[[bytes], NDArray[Any]]] = {
+    "Vec<(u16, u16)>": decode_weights,
+    "Vec<u64>": decode_vec_u64,
+    "Vec<bool>": decode_vec_bool,
+}
+
+SCALAR_DTYPES: dict[str, str] = {
+    "u64": "<u8",
+}
+
+
+def _normalize_type(type_string: str) -> str:
+    return type_string.replace(" ", "").replace(",", ", ")
+
+
+def _split_key(
+    key: bytes, hashers: list[str], key_types: list[str]
+) -> tuple[bytes, ...]:
+    """
+    Splits the part of a storage key after the map prefix into the raw,
+    unhashed map keys.
+    """
+    parts: list[bytes] = []
+    offset = 0
+    for hasher, key_type in zip(hashers, key_types):
+        offset += CONCAT_HASHER_PREFIX[hasher]
+        size = KEY_TYPE_SIZES[key_type]
+        parts.append(key[offset:offset + size])
+        offset += size
+    return tuple(parts)
+
+
+def _decode_key(raw: bytes, key_type: str, ss58_format: int) -> str:
+    if key_type in ("AccountId", "AccountId32"):
+        return ss58_encode(raw, ss58_format=ss58_format)  # type: ignore
+    return str(int.from_bytes(raw, "little"))
+
+
+def query_map_values(
+    client: SubstrateInterface,
+    module: str,
+    storage_function: str,
+    params: list[Any] = [],
+    block_hash: str | None = None,
+) -> dict[str, Any]:
+    result = client.query_map(  # type: ignore
+        module=module, storage_function=storage_function, params=params, block_hash=block_hash  # type: ignore
+    )
+    return {str(k.value): v.value for k, v in result}  # type: ignore
+
+
+def query_map_raw(
+    client: SubstrateInterface,
+    module: str,
+    storage_function: str,
+    params: list[Any] = [],
+    block_hash: str | None = None,
+    value_types: Collection[str] = (),
+) -> tuple[list[tuple[bytes, ...]], list[bytes], str, list[str]] | None:
+    """
+    Fetches every entry under a storage map prefix as raw SCALE bytes.
+
+    Returns:
+    (raw remaining map keys of every entry, raw values, value type string,
+    remaining key type strings), or None if the value type is not one of
+    `value_types` or the remaining map keys cannot be read back from the
+    storage key, in which case the caller should use the generic path.
+    """
+    client.init_runtime(block_hash=block_hash)  # type: ignore
+    storage_item = client.get_metadata_storage_function(  # type: ignore
+        module, storage_function, block_hash=block_hash
+    )
+    value_type: str = _normalize_type(storage_item.get_value_type_string())  # type: ignore
+    param_types: list[str] = storage_item.get_params_type_string()  # type: ignore
+    param_hashers: list[str] = storage_item.get_param_hashers()  # type: ignore
+    key_types = param_types[len(params):]
+    hashers = param_hashers[len(params):]
+
+    if value_type not in value_types or not key_types:
+        return None
+    if any(h not in CONCAT_HASHER_PREFIX for h in hashers) or any(
+        t not in KEY_TYPE_SIZES for t in key_types
+    ):
+        return None
+
+    prefix: str = StorageKey.create_from_storage_function(  # type: ignore
+        module,
+        storage_item.value["name"],  # type: ignore
+        params,
+        runtime_config=client.runtime_config,  # type: ignore
+        metadata=client.metadata,  # type: ignore
+    ).to_hex()
+    prefix_len = (len(prefix) - 2) // 2
+
+    keys: list[tuple[bytes, ...]] = []
+    values: list[bytes] = []
+    start_key: str | None = None
+    while True:
+        page: list[str] = client.rpc_request(  # type: ignore
+            "state_getKeysPaged", [prefix, PAGE_SIZE, start_key, block_hash]
+        )["result"]
+        if not page:
+            break
+        response = client.rpc_request(  # type: ignore
+            "state_queryStorageAt", [page, block_hash]
+        )
+        for group in response["result"]:  # type: ignore
+            for storage_key, value in group["changes"]:  # type: ignore
+                if value is None:
+                    continue
+                key_bytes = bytes.fromhex(storage_key[2:])[prefix_len:]
+                keys.append(_split_key(key_bytes, hashers, key_types))
+                values.append(bytes.fromhex(value[2:]))
+        if len(page) < PAGE_SIZE:
+            break
+        start_key = page[-1]
+
+    return keys, values, value_type, key_types
+
+
+def query_map_arrays(
+    client: SubstrateInterface,
+    module: str,
+    storage_function: str,
+    params: list[Any] = [],
+    block_hash: str | None = None,
+) -> dict[str, Any]:
+    """
+    Same as `query_map_values`, but `Vec` values of a known hot type are
+    decoded into NumPy arrays. Unknown types go through the generic decoder.
+    """
+    raw = query_map_raw(
+        client, module, storage_function, params, block_hash, VEC_DECODERS
+    )
+    if raw is None or len(raw[3]) != 1:
+        return query_map_values(client, module, storage_function, params, block_hash)
+
+    keys, values, value_type, (key_type,) = raw
+    decoder = VEC_DECODERS[value_type]
+    return {
+        _decode_key(key, key_type, client.ss58_format): decoder(value)  # type: ignore
+        for (key,), value in zip(keys, values)
+    }
+
+
+def query_map_totals(
+    client: SubstrateInterface,
+    module: str,
+    storage_function: str,
+    params: list[Any] = [],
+    block_hash: str | None = None,
+) -> dict[str, int]:
+    """
+    Sums a map with fixed-width scalar values (e.g. `u64` stake) over its
+    remaining keys, grouped by the first one. The whole map is fetched in one
+    pass and its values decoded into a single array, e.g. `Stake(hotkey,
+    coldkey)` gives the total stake of every hotkey.
+    """
+    raw = query_map_raw(
+        client, module, storage_function, params, block_hash, SCALAR_DTYPES
+    )
+    if raw is None:
+        result = client.query_map(  # type: ignore
+            module=module, storage_function=storage_function, params=params, block_hash=block_hash  # type: ignore
+        )
+        generic: dict[str, int] = {}
+        for k, v in result:  # type: ignore
+            first = k[0] if isinstance(k, tuple) else k  # type: ignore
+            generic[str(first.value)] = generic.get(str(first.value), 0) + int(v.value)  # type: ignore
+        return generic
+
+    keys, values, value_type, key_types = raw
+    column = np.frombuffer(b"".join(values), dtype=SCALAR_DTYPES[value_type])
+    groups: dict[bytes, int] = {}
+    inverse = np.fromiter(
+        (groups.setdefault(key[0], len(groups)) for key in keys),
+        dtype=np.intp,
+        count=len(keys),
+    )
+    totals = np.zeros(len(groups), dtype=np.uint64)
+    np.add.at(totals, inverse, column)
+    return {
+        _decode_key(key, key_types[0], client.ss58_format): total  # type: ignore
+        for key, total in zip(groups, totals.tolist())
+    }
@@ -0,0 +1,75 @@
+"""
+Snapshot spec layout shared by `builder.py` and `follow.py`
+"""
+from typing import Any
+
+QUERY_URL = "wss://api.communeai.net"
+
+EXISTENTIAL_DEPOSIT = 500
+MAX_NAME_LENGTH = 32
+
+SUDO = "5Dy6aBqv2MQEVpSAKqB147uQUZrAqK18JjFWs2jnzSXHn6Lh"
+
+
+def assemble_subnets(
+    netuids: list[int],
+    subnet_names: dict[int, str],
+    founders: dict[int, str],
+    keys: dict[int, dict[int, str]],
+    names: dict[int, dict[int, str]],
+    addresses: dict[int, dict[int, str]],
+    stake_froms: dict[str, dict[str, int]],
+) -> dict[str, Any]:
+    """
+    Lays out the per-subnet module data in the snapshot spec format.
+    Module names are truncated and must be unique across all subnets; subnets
+    and modules are visited in netuid and uid order, so the module with the
+    lowest (netuid, uid) keeps a duplicated name.
+    """
+    subnets: dict[Any, Any] = {
+        "subnets": []
+    }
+
+    encountered_names = set()
+    for netuid in sorted(netuids):
+        subnet = {
+            "name": subnet_names[netuid],
+            "founder": founders[netuid],
+            "modules": []
+        }
+
+        for index, key in sorted(keys[netuid].items()):
+            name = names[netuid][index][:MAX_NAME_LENGTH]
+            if name in encountered_names:
+                continue
+            encountered_names.add(name)
+
+            module = {
+                "key": key,
+                "name": name,
+                "address": addresses[netuid][index][:MAX_NAME_LENGTH],
+                "stake_from": stake_froms.get(key, {})
+            }
+            subnet["modules"].append(module)
+
+        subnets["subnets"].append(subnet)
+    return subnets
+
+
+def get_sudo(key: str) -> dict[str, str]:
+    return {"sudo": key}
+
+def build_snap(code: dict[str, str], balances: dict[str, dict[str, int]], subnets: dict[str, Any]) -> dict[str, Any]:
+    """
+    Returns:
+    snapshot spec with keys, in the following order:
+    - sudo: str
+    - balances: dict[str, int]
+    - subnets: dict[str, Any]
+    """
+    spec: dict[str, Any] = {}
+    spec.update(code)
+    spec.update(get_sudo(SUDO))
+    spec.update(balances)
+    spec.update(subnets)
+    return spec
@@ -0,0 +1,403 @@
+"""
+Runs consensus backtests over a grid of configurations.
+
+The chain state is crawled once into a cache shared by every configuration:
+each epoch block is fetched a single time, no matter how many (tempo,
+start block, epochs) combinations need it. The Rust backtest
+(`tests/src/offworker/backtest.rs`) is built once and run for every
+configuration across a process pool. Crawled blocks, datasets and
+per-configuration results are all cached, so an interrupted sweep resumes
+where it stopped.
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any
+
+import msgpack  # type: ignore
+from substrateinterface import SubstrateInterface  # type: ignore
+
+from backtest import (
+    DEFAULT_ITER_EPOCHS,
+    DEFAULT_START_BLOCK,
+    DEFAULT_TEMPO,
+    QUERY_URL,
+    get_epoch_data,
+    get_stake,
+)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+BACKTEST_TEST = "offworker::backtest::test_backtest_consensus"
+# consensus params `test_backtest_consensus` can overwrite
+CONSENSUS_PARAMS = [
+    "kappa",
+    "max_allowed_validators",
+    "bonds_moving_average",
+    "max_weight_age",
+    "alpha_low",
+    "alpha_high",
+]
+
+SUMMARY_FIELDS = [
+    "epochs",
+    "total_emission",
+    "mean_epoch_emission",
+    "validators",
+    "top_dividend_share",
+]
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str) -> Any:
+    with open(path) as f:
+        return json.load(f)
+
+
+def parse_param(value: str) -> tuple[str, list[int]]:
+    name, _, values = value.partition("=")
+    if not name or not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=V1,V2,..., got {value!r}")
+    if name not in CONSENSUS_PARAMS:
+        raise argparse.ArgumentTypeError(
+            f"unknown consensus param {name!r}, expected one of {', '.join(CONSENSUS_PARAMS)}"
+        )
+    return name, [int(v) for v in values.split(",")]
+
+
+def expand_grid(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """
+    Returns every distinct configuration of the grid.
+    """
+    params: dict[str, list[int]] = dict(args.param or [])
+    names = sorted(params)
+
+    configs: dict[str, dict[str, Any]] = {}
+    for tempo, start_block, iter_epochs, *values in itertools.product(
+        args.tempo, args.start_block, args.iter_epochs, *(params[n] for n in names)
+    ):
+        config = {
+            "tempo": tempo,
+            "start_block": start_block,
+            "iter_epochs": iter_epochs,
+            "params": dict(zip(names, values)),
+        }
+        configs[config_id(config)] = config
+    return list(configs.values())
+
+
+def config_id(config: dict[str, Any]) -> str:
+    encoded = json.dumps(config, sort_keys=True).encode()
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def dataset_id(config: dict[str, Any]) -> str:
+    return f"t{config['tempo']}_s{config['start_block']}_e{config['iter_epochs']}"
+
+
+def epoch_blocks(config: dict[str, Any]) -> list[int]:
+    return [
+        config["start_block"] + i * config["tempo"]
+        for i in range(config["iter_epochs"])
+    ]
+
+
+def crawl(
+    url: str, subnet: int, cache_dir: str, configs: list[dict[str, Any]]
+) -> None:
+    """
+    Fetches every stake snapshot and epoch block the configurations need,
+    skipping those already in the cache.
+    """
+    start_blocks = {config["start_block"] for config in configs}
+    blocks = set(itertools.chain.from_iterable(epoch_blocks(c) for c in configs))
+
+    missing_stake = sorted(
+        b for b in start_blocks
+        if not os.path.exists(os.path.join(cache_dir, "stake", f"{b}.json"))
+    )
+    missing_blocks = sorted(
+        b for b in blocks
+        if not os.path.exists(os.path.join(cache_dir, "epochs", f"{b}.json"))
+    )
+    print(
+        f"{len(blocks)} epoch blocks needed, {len(missing_blocks)} to crawl; "
+        f"{len(start_blocks)} stake snapshots needed, {len(missing_stake)} to crawl"
+    )
+    if not missing_stake and not missing_blocks:
+        return
+
+    client = SubstrateInterface(url)
+    print(f"Connected to {url}")
+
+    for block_number in missing_stake:
+        print(f"Getting stake at block {block_number}...")
+        stake = get_stake(client, subnet, client.get_block_hash(block_number))
+        write_atomic(
+            os.path.join(cache_dir, "stake", f"{block_number}.json"),
+            json.dumps(stake).encode(),
+        )
+
+    for block_number in missing_blocks:
+        block_hash = client.get_block_hash(block_number)
+        later_block_hash = client.get_block_hash(block_number + 1)
+        weights, last_update, registration_blocks, validator_permits = get_epoch_data(
+            client, subnet, block_hash, later_block_hash
+        )
+        epoch = {
+            "weights": weights,
+            "last_update": last_update,
+            "registration_blocks": registration_blocks,
+            "validator_permits": validator_permits,
+        }
+        write_atomic(
+            os.path.join(cache_dir, "epochs", f"{block_number}.json"),
+            json.dumps(epoch).encode(),
+        )
+        print(f"Collected data for block {block_number}")
+
+
+def build_dataset(cache_dir: str, config: dict[str, Any]) -> str:
+    """
+    Assembles the cached blocks of a configuration into the msgpack layout
+    the Rust backtest reads. Configurations differing only in consensus
+    params share the dataset.
+    """
+    path = os.path.join(cache_dir, "datasets", f"{dataset_id(config)}.msgpack")
+    if os.path.exists(path):
+        return path
+
+    data: dict[str, Any] = {
+        "stake": read_json(
+            os.path.join(cache_dir, "stake", f"{config['start_block']}.json")
+        ),
+        "weights": {},
+        "last_update": {},
+        "registration_blocks": {},
+        "validator_permits": {},
+    }
+    for block_number in epoch_blocks(config):
+        epoch = read_json(os.path.join(cache_dir, "epochs", f"{block_number}.json"))
+        for field, value in epoch.items():
+            data[field][str(block_number)] = value
+
+    write_atomic(path, msgpack.packb(data))
+    return path
+
+
+def build_backtest_binary() -> str:
+    """
+    Builds the test crate once and returns the test executable, so workers
+    don't contend on the cargo build lock.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "cargo", "test", "--package", "tests", "--features", "testing-offworker",
+                "--no-run", "--message-format=json",
+            ],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        # compiler errors go to stdout as json messages, cargo's own to stderr
+        for line in e.stdout.splitlines():
+            message = json.loads(line)
+            if message.get("reason") == "compiler-message":
+                print(message["message"]["rendered"], end="")
+        print(e.stderr, end="")
+        raise
+    for line in result.stdout.splitlines():
+        message = json.loads(line)
+        if (
+            message.get("reason") == "compiler-artifact"
+            and message["target"]["name"] == "tests"
+            and message.get("executable")
+        ):
+            return message["executable"]
+    raise RuntimeError("cargo did not produce the tests executable")
+
+
+def binary_fingerprint(binary: str) -> str:
+    """
+    Hashes the test executable, so results computed by older consensus code
+    are never reused.
+    """
+    digest = hashlib.sha256()
+    with open(binary, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def run_config(
+    binary: str, dataset_path: str, config: dict[str, Any], result_path: str
+) -> str:
+    tmp_path = f"{result_path}.tmp"
+    env = dict(
+        os.environ,
+        BACKTEST_DATA=dataset_path,
+        BACKTEST_OUTPUT=tmp_path,
+        BACKTEST_TEMPO=str(config["tempo"]),
+        BACKTEST_PARAMS=",".join(f"{k}={v}" for k, v in config["params"].items()),
+    )
+    result = subprocess.run(
+        [binary, BACKTEST_TEST, "--exact", "--ignored", "--nocapture"],
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+    if not os.path.exists(tmp_path):
+        raise RuntimeError(
+            "backtest exited without writing its output: "
+            f"{result.stdout.decode(errors='replace')[-2000:]}"
+        )
+    os.replace(tmp_path, result_path)
+    return result_path
+
+
+def summarize(result_path: str) -> dict[str, Any]:
+    """
+    Reduces the per-epoch emissions and dividends of a run to one row.
+    """
+    emission_per_block: dict[str, int] = {}
+    dividends_per_uid: dict[str, int] = {}
+    with open(result_path, "r") as csvfile:
+        for row in csv.DictReader(csvfile):
+            emission_per_block[row["block"]] = (
+                emission_per_block.get(row["block"], 0) + int(row["emission"])
+            )
+            dividends_per_uid[row["uid"]] = (
+                dividends_per_uid.get(row["uid"], 0) + int(row["dividends"])
+            )
+
+    epochs = len(emission_per_block)
+    total_emission = sum(emission_per_block.values())
+    total_dividends = sum(dividends_per_uid.values())
+    return {
+        "epochs": epochs,
+        "total_emission": total_emission,
+        "mean_epoch_emission": total_emission // epochs if epochs else 0,
+        "validators": sum(1 for d in dividends_per_uid.values() if d > 0),
+        "top_dividend_share": (
+            round(max(dividends_per_uid.values()) / total_dividends, 6)
+            if total_dividends else 0.0
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run consensus backtests over a grid of configurations."
+    )
+    parser.add_argument("-s", "--subnet", type=int,
+                        required=True, help="Subnet number")
+    parser.add_argument("--tempo", type=int, nargs="+",
+                        default=[DEFAULT_TEMPO], help="Tempo values")
+    parser.add_argument("--start-block", type=int, nargs="+",
+                        default=[DEFAULT_START_BLOCK], help="Start block numbers")
+    parser.add_argument("--iter-epochs", type=int, nargs="+",
+                        default=[DEFAULT_ITER_EPOCHS], help="Numbers of iteration epochs")
+    parser.add_argument(
+        "-p",
+        "--param",
+        type=parse_param,
+        action="append",
+        help=f"Consensus param values as NAME=V1,V2,... ({', '.join(CONSENSUS_PARAMS)})",
+    )
+    parser.add_argument("-c", "--cache-dir", default="sweep_cache",
+                        help="Directory for the crawl and result cache")
+    parser.add_argument("-o", "--output", default="sweep.csv",
+                        help="Output table file name")
+    parser.add_argument("-j", "--workers", type=int,
+                        default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--url", default=QUERY_URL, help="Node websocket URL")
+    args: argparse.Namespace = parser.parse_args()
+
+    cache_dir = os.path.join(args.cache_dir, f"sn{args.subnet}")
+
+    configs = expand_grid(args)
+    print(f"Sweeping {len(configs)} configurations")
+
+    crawl(args.url, args.subnet, cache_dir, configs)
+
+    print("Building backtest...")
+    try:
+        binary = build_backtest_binary()
+    except subprocess.CalledProcessError as e:
+        raise SystemExit(f"Building the backtest failed with exit code {e.returncode}")
+    results_dir = os.path.join(cache_dir, "results", binary_fingerprint(binary))
+
+    result_paths = {
+        config_id(config): os.path.join(results_dir, f"{config_id(config)}.csv")
+        for config in configs
+    }
+    pending = [c for c in configs if not os.path.exists(result_paths[config_id(c)])]
+    print(f"{len(configs) - len(pending)} configurations already evaluated")
+
+    if pending:
+        os.makedirs(results_dir, exist_ok=True)
+
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(
+                    run_config,
+                    binary,
+                    build_dataset(cache_dir, config),
+                    config,
+                    result_paths[config_id(config)],
+                ): config
+                for config in pending
+            }
+            for future in as_completed(futures):
+                config = futures[future]
+                try:
+                    future.result()
+                    print(f"Evaluated {dataset_id(config)} {config['params']}")
+                except subprocess.CalledProcessError as e:
+                    print(f"Error evaluating {dataset_id(config)} {config['params']}: "
+                          f"{e.stderr.decode(errors='replace')[-2000:]}")
+                except Exception as e:
+                    print(f"Error evaluating {dataset_id(config)} {config['params']}: {e}")
+
+    param_names = sorted({name for config in configs for name in config["params"]})
+    fields = ["tempo", "start_block", "iter_epochs", *param_names, *SUMMARY_FIELDS]
+
+    rows: list[dict[str, Any]] = []
+    for config in configs:
+        result_path = result_paths[config_id(config)]
+        if not os.path.exists(result_path):
+            continue
+        row = {
+            "tempo": config["tempo"],
+            "start_block": config["start_block"],
+            "iter_epochs": config["iter_epochs"],
+            **config["params"],
+        }
+        row.update(summarize(result_path))
+        rows.append(row)
+
+    print(f"Writing table to {args.output}")
+    with open(args.output, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Sweep complete, {len(rows)} of {len(configs)} configurations evaluated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Checks the fast-path decoders against bytes encoded by scalecodec and storage
+keys built with the substrate hashers.
+"""
+from typing import Any
+
+import pytest
+from scalecodec.base import RuntimeConfigurationObject  # type: ignore
+from scalecodec.type_registry import load_type_registry_preset  # type: ignore
+from scalecodec.utils.ss58 import ss58_encode  # type: ignore
+from substrateinterface.utils.hasher import blake2_128_concat, two_x64_concat  # type: ignore
+
+import fast_decode
+from fast_decode import (
+    decode_compact,
+    decode_vec_bool,
+    decode_vec_u64,
+    decode_weights,
+    query_map_arrays,
+    query_map_raw,
+    query_map_totals,
+)
+
+RUNTIME_CONFIG = RuntimeConfigurationObject()
+RUNTIME_CONFIG.update_type_registry(load_type_registry_preset("core"))
+
+SS58_FORMAT = 42
+PREFIX = "0x" + "ab" * 32
+
+HOTKEY_A = bytes(range(32))
+HOTKEY_B = bytes(range(1, 33))
+COLDKEY_A = bytes(range(2, 34))
+COLDKEY_B = bytes(range(3, 35))
+
+HASHERS = {
+    "Identity": lambda data: data,
+    "Twox64Concat": two_x64_concat,
+    "Blake2_128Concat": blake2_128_concat,
+}
+
+
+def encode(type_string: str, value: Any) -> bytes:
+    return RUNTIME_CONFIG.create_scale_object(type_string).encode(value).data
+
+
+def address(account: bytes) -> str:
+    return ss58_encode(account, ss58_format=SS58_FORMAT)
+
+
+class StorageItem:
+    def __init__(self, name: str, value_type: str, key_types: list[str], hashers: list[str]):
+        self.value = {"name": name}
+        self.value_type = value_type
+        self.key_types = key_types
+        self.hashers = hashers
+
+    def get_value_type_string(self) -> str:
+        return self.value_type
+
+    def get_params_type_string(self) -> list[str]:
+        return self.key_types
+
+    def get_param_hashers(self) -> list[str]:
+        return self.hashers
+
+
+class Scale:
+    def __init__(self, value: Any):
+        self.value = value
+
+
+class Client:
+    """
+    Serves a single storage map from memory, through both the raw RPCs and
+    the generic `query_map`.
+    """
+
+    ss58_format = SS58_FORMAT
+    runtime_config = None
+    metadata = None
+
+    def __init__(self, item: StorageItem, storage: dict[str, bytes], generic: list[Any]):
+        self.item = item
+        self.storage = {k: "0x" + v.hex() for k, v in storage.items()}
+        self.generic = generic
+        self.rpc_calls: list[str] = []
+
+    def init_runtime(self, block_hash: str | None = None) -> None:
+        pass
+
+    def get_metadata_storage_function(
+        self, module: str, storage_function: str, block_hash: str | None = None
+    ) -> StorageItem:
+        return self.item
+
+    def rpc_request(self, method: str, params: list[Any]) -> dict[str, Any]:
+        self.rpc_calls.append(method)
+        if method == "state_getKeysPaged":
+            prefix, count, start_key, _ = params
+            keys = sorted(
+                k for k in self.storage
+                if k.startswith(prefix) and (start_key is None or k > start_key)
+            )
+            return {"result": keys[:count]}
+        if method == "state_queryStorageAt":
+            keys, block_hash = params
+            changes = [[k, self.storage.get(k)] for k in keys]
+            return {"result": [{"block": block_hash, "changes": changes}]}
+        raise ValueError(f"unsupported method {method}")
+
+    def query_map(self, **kwargs: Any) -> list[Any]:
+        return self.generic
+
+
+class Prefix:
+    def to_hex(self) -> str:
+        return PREFIX
+
+
+@pytest.fixture(autouse=True)
+def storage_prefix(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(
+        fast_decode.StorageKey,
+        "create_from_storage_function",
+        lambda *args, **kwargs: Prefix(),
+    )
+
+
+@pytest.mark.parametrize("value", [
+    0, 1, 63,  # single byte
+    64, 16383,  # two bytes
+    16384, 2**30 - 1,  # four bytes
+    2**30, 2**64 - 1, 2**128 - 1,  # big integer
+])
+def test_decode_compact(value: int):
+    data = encode("Compact<u128>", value)
+    assert decode_compact(data) == (value, len(data))
+    assert decode_compact(b"\xff\xff" + data, offset=2) == (value, len(data) + 2)
+
+
+@pytest.mark.parametrize("length", [0, 3, 64, 300])
+def test_decode_weights(length: int):
+    weights = [(i, (i * 7919) % 65536) for i in range(length)]
+    decoded = decode_weights(encode("Vec<(u16, u16)>", weights))
+    assert decoded.shape == (length, 2)
+    assert decoded.tolist() == [list(w) for w in weights]
+
+
+@pytest.mark.parametrize("values", [[], [0, 2**64 - 1, 5], list(range(0, 2**40, 2**33))])
+def test_decode_vec_u64(values: list[int]):
+    assert decode_vec_u64(encode("Vec<u64>", values)).tolist() == values
+
+
+@pytest.mark.parametrize("values", [[], [True, False, True], [i % 3 == 0 for i in range(100)]])
+def test_decode_vec_bool(values: list[bool]):
+    assert decode_vec_bool(encode("Vec<bool>", values)).tolist() == values
+
+
+@pytest.mark.parametrize("hasher", list(HASHERS))
+@pytest.mark.parametrize("key_type, raw, expected", [
+    ("u16", encode("u16", 513), "513"),
+    ("AccountId", HOTKEY_A, address(HOTKEY_A)),
+])
+def test_decode_key(hasher: str, key_type: str, raw: bytes, expected: str):
+    # a second key behind a different hasher checks the first one's length
+    key = HASHERS[hasher](raw) + blake2_128_concat(encode("u16", 7))
+    first, second = fast_decode._split_key(
+        key, [hasher, "Blake2_128Concat"], [key_type, "u16"]
+    )
+    assert first == raw
+    assert fast_decode._decode_key(first, key_type, SS58_FORMAT) == expected
+    assert fast_decode._decode_key(second, "u16", SS58_FORMAT) == "7"
+
+
+def weights_client(value_type: str) -> Client:
+    item = StorageItem("Weights", value_type, ["u16", "u16"], ["Identity", "Identity"])
+    storage = {
+        PREFIX + encode("u16", uid).hex(): encode("Vec<(u16, u16)>", weights)
+        for uid, weights in [(0, [(1, 10), (2, 20)]), (300, []), (5, [(0, 65535)])]
+    }
+    generic = [(Scale(3), Scale([[4, 40]]))]
+    return Client(item, storage, generic)
+
+
+def test_query_map_arrays():
+    client = weights_client("Vec<(u16, u16)>")
+    result = {k: v.tolist() for k, v in query_map_arrays(client, "M", "Weights", [0]).items()}
+    assert result == {"0": [[1, 10], [2, 20]], "5": [[0, 65535]], "300": []}
+
+
+def test_unknown_value_type_falls_back():
+    client = weights_client("Vec<(u16, u32)>")
+    assert query_map_raw(client, "M", "Weights", [0], None, fast_decode.VEC_DECODERS) is None
+    assert query_map_arrays(client, "M", "Weights", [0]) == {"3": [[4, 40]]}
+    assert client.rpc_calls == []
+
+
+def stake_client(value_type: str) -> Client:
+    item = StorageItem(
+        "Stake", value_type, ["AccountId", "AccountId"], ["Identity", "Identity"]
+    )
+    stakes = [
+        (HOTKEY_A, COLDKEY_A, 2**62), (HOTKEY_A, COLDKEY_B, 2**62 + 3),
+        (HOTKEY_B, COLDKEY_A, 5),
+    ]
+    storage = {
+        PREFIX + (hotkey + coldkey).hex(): encode("u64", stake)
+        for hotkey, coldkey, stake in stakes
+    }
+    generic = [
+        ((Scale(address(hotkey)), Scale(address(coldkey))), Scale(stake))
+        for hotkey, coldkey, stake in stakes
+    ]
+    return Client(item, storage, generic)
+
+
+def test_query_map_totals():
+    client = stake_client("u64")
+    totals = query_map_totals(client, "M", "Stake")
+    # the sum exceeds what a float64 holds exactly
+    assert totals == {address(HOTKEY_A): 2**63 + 3, address(HOTKEY_B): 5}
+    assert client.rpc_calls == ["state_getKeysPaged", "state_queryStorageAt"]
+
+
+def test_query_map_totals_paged(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(fast_decode, "PAGE_SIZE", 2)
+    assert query_map_totals(stake_client("u64"), "M", "Stake") == {
+        address(HOTKEY_A): 2**63 + 3, address(HOTKEY_B): 5,
+    }
+
+
+def test_query_map_totals_falls_back():
+    client = stake_client("u128")
+    assert query_map_totals(client, "M", "Stake") == {
+        address(HOTKEY_A): 2**63 + 3, address(HOTKEY_B): 5,
+    }
+    assert client.rpc_calls == []
@@ -0,0 +1,191 @@
+"""
+Drives the snapshot follower with an in-memory mock node.
+
+Storage keys and values are encoded with the substrate hashers and scalecodec,
+independently of the offsets `follow.py` decodes them with.
+"""
+from typing import Any
+
+from scalecodec.base import RuntimeConfigurationObject  # type: ignore
+from scalecodec.type_registry import load_type_registry_preset  # type: ignore
+from scalecodec.utils.ss58 import ss58_encode  # type: ignore
+from substrateinterface.utils.hasher import blake2_128_concat, two_x64_concat  # type: ignore
+
+import follow
+from follow import Follower, MockNode
+
+RUNTIME_CONFIG = RuntimeConfigurationObject()
+RUNTIME_CONFIG.update_type_registry(load_type_registry_preset("core"))
+RUNTIME_CONFIG.update_type_registry({"types": {
+    "SnapshotAccountData": {
+        "type": "struct",
+        "type_mapping": [
+            ["free", "u64"], ["reserved", "u64"], ["frozen", "u64"], ["flags", "u128"],
+        ],
+    },
+    "SnapshotAccountInfo": {
+        "type": "struct",
+        "type_mapping": [
+            ["nonce", "u32"], ["consumers", "u32"], ["providers", "u32"],
+            ["sufficients", "u32"], ["data", "SnapshotAccountData"],
+        ],
+    },
+}})
+
+ALICE = bytes(range(32))
+BOB = bytes(range(1, 33))
+CHARLIE = bytes(range(2, 34))
+
+
+def address(account: bytes) -> str:
+    return ss58_encode(account, ss58_format=follow.SS58_FORMAT)
+
+
+def encode(type_string: str, value: Any) -> str:
+    return RUNTIME_CONFIG.create_scale_object(type_string).encode(value).to_hex()
+
+
+def u16(value: int) -> bytes:
+    return value.to_bytes(2, "little")
+
+
+def account_entry(account: bytes, free: int) -> tuple[str, str]:
+    key = follow.ACCOUNT + blake2_128_concat(account).hex()
+    value = encode("SnapshotAccountInfo", {
+        "nonce": 1, "consumers": 2, "providers": 3, "sufficients": 4,
+        "data": {"free": free, "reserved": 6, "frozen": 7, "flags": 8},
+    })
+    return key, value
+
+
+def stake_from_key(staked: bytes, staker: bytes) -> str:
+    return follow.STAKE_FROM + (staked + staker).hex()
+
+
+def keys_key(netuid: int, uid: int) -> str:
+    return follow.KEYS + (u16(netuid) + u16(uid)).hex()
+
+
+def name_key(netuid: int, uid: int) -> str:
+    return follow.NAME + (two_x64_concat(u16(netuid)) + two_x64_concat(u16(uid))).hex()
+
+
+def address_key(netuid: int, uid: int) -> str:
+    return follow.ADDRESS + (two_x64_concat(u16(netuid)) + two_x64_concat(u16(uid))).hex()
+
+
+def genesis_storage() -> dict[str, str]:
+    storage = dict([account_entry(ALICE, 10**12), account_entry(BOB, 10**9)])
+    storage[follow.SUBNET_NAMES + u16(0).hex()] = encode("Bytes", "net0")
+    storage[follow.FOUNDER + u16(0).hex()] = "0x" + ALICE.hex()
+    storage[keys_key(0, 0)] = "0x" + ALICE.hex()
+    storage[name_key(0, 0)] = encode("Bytes", "mod0")
+    storage[address_key(0, 0)] = encode("Bytes", "0.0.0.0:80")
+    storage[stake_from_key(ALICE, BOB)] = encode("u64", 500)
+    return storage
+
+
+def bootstrapped() -> tuple[MockNode, Follower]:
+    node = MockNode(genesis_storage())
+    follower = Follower(node)
+    follower.bootstrap()
+    return node, follower
+
+
+def modules(spec: dict[str, Any]) -> list[dict[str, Any]]:
+    return spec["subnets"][0]["modules"]
+
+
+def test_bootstrap():
+    _, follower = bootstrapped()
+    spec = follower.state.spec()
+
+    assert follower.state.block_number == 0
+    assert not follower.busy
+    assert spec["balances"] == {address(ALICE): 10**12, address(BOB): 10**9}
+    assert spec["subnets"] == [{
+        "name": "net0",
+        "founder": address(ALICE),
+        "modules": [{
+            "key": address(ALICE),
+            "name": "mod0",
+            "address": "0.0.0.0:80",
+            "stake_from": {address(BOB): 500},
+        }],
+    }]
+
+
+def test_module_add_and_remove():
+    node, follower = bootstrapped()
+
+    node.produce_block({
+        keys_key(0, 1): "0x" + CHARLIE.hex(),
+        name_key(0, 1): encode("Bytes", "mod1"),
+        address_key(0, 1): encode("Bytes", "1.1.1.1:80"),
+        stake_from_key(CHARLIE, ALICE): encode("u64", 7),
+    })
+    follower.run()
+    assert modules(follower.state.spec())[1] == {
+        "key": address(CHARLIE),
+        "name": "mod1",
+        "address": "1.1.1.1:80",
+        "stake_from": {address(ALICE): 7},
+    }
+
+    node.produce_block({
+        keys_key(0, 1): None,
+        name_key(0, 1): None,
+        address_key(0, 1): None,
+        stake_from_key(CHARLIE, ALICE): None,
+        stake_from_key(ALICE, BOB): None,
+    })
+    follower.run()
+    spec = follower.state.spec()
+    assert [m["key"] for m in modules(spec)] == [address(ALICE)]
+    assert modules(spec)[0]["stake_from"] == {}
+    assert follower.state.stake_from == {}
+    assert follower.state.names == {0: {0: "mod0"}}
+    assert follower.state.addresses == {0: {0: "0.0.0.0:80"}}
+
+
+def test_finality_jump_applies_pending_blocks_in_order():
+    node, follower = bootstrapped()
+
+    node.produce_block(dict([account_entry(CHARLIE, 10**6)]), finalize=False)
+    node.produce_block({stake_from_key(ALICE, CHARLIE): encode("u64", 3)}, finalize=False)
+    node.produce_block(dict([account_entry(CHARLIE, 2 * 10**6)]), finalize=False)
+    follower.run()
+    assert follower.state.block_number == 0
+
+    node.finalize(3)
+    follower.run()
+    spec = follower.state.spec()
+    assert follower.state.block_number == 3
+    assert follower.state.block_hash == node.hashes[3]
+    assert spec["balances"][address(CHARLIE)] == 2 * 10**6
+    assert modules(spec)[0]["stake_from"] == {address(BOB): 500, address(CHARLIE): 3}
+    assert not follower.pending
+
+
+def test_missing_changes_reload_state():
+    node, follower = bootstrapped()
+
+    node.produce_block(dict([account_entry(BOB, 42 * 10**6)]), notify=False)
+    node.produce_block({name_key(0, 0): encode("Bytes", "renamed")}, finalize=False)
+    node.finalize(2)
+    follower.run()
+
+    spec = follower.state.spec()
+    assert follower.state.block_number == 2
+    assert spec["balances"][address(BOB)] == 42 * 10**6
+    assert modules(spec)[0]["name"] == "renamed"
+
+
+def test_balances_below_existential_deposit_are_dropped():
+    node, follower = bootstrapped()
+
+    node.produce_block(dict([account_entry(BOB, follow.EXISTENTIAL_DEPOSIT)]))
+    follower.run()
+
+    assert address(BOB) in follower.state.balances
+    assert address(BOB) not in follower.state.spec()["balances"]
@@ -0,0 +1,134 @@
+//! Consensus backtest over crawled network data.
+//!
+//! Driven by `scripts/python/sweep.py`, which crawls the chain once and runs this test for every
+//! configuration of a parameter grid. The test is ignored by default and only runs when selected
+//! with `--ignored`.
+//!
+//! - `BACKTEST_DATA`: msgpack dataset, same layout as `data/sn31_sim.msgpack`
+//! - `BACKTEST_OUTPUT`: csv file the per-epoch emissions and dividends are written to
+//! - `BACKTEST_TEMPO`: subnet tempo, defaults to 360
+//! - `BACKTEST_PARAMS`: consensus parameter overwrites, as `name=value,name=value`
+
+use crate::{
+    mock::*,
+    offworker::{
+        data::{
+            load_msgpack_from, make_parameter_consensus_overwrites, register_modules_from_msgpack,
+        },
+        util::setup_subnet,
+    },
+};
+use pallet_subnet_emission::subnet_consensus::{util::params::ConsensusParams, yuma::YumaEpoch};
+use pallet_subspace::{AlphaValues, BondsMovingAverage, Kappa, MaxAllowedValidators, MaxWeightAge};
+use std::{env, path::PathBuf};
+
+const TEST_SUBNET_ID: u16 = 0;
+const DEFAULT_TEMPO: u64 = 360;
+const PENDING_EMISSION: u64 = to_nano(1_000);
+
+fn apply_consensus_param_overwrites(netuid: u16, params: &str) {
+    for pair in params.split(',').filter(|pair| !pair.is_empty()) {
+        let (name, value) = pair.split_once('=').expect("params must be `name=value` pairs");
+        let value: u64 = value.parse().expect("param values must be integers");
+
+        match name {
+            "kappa" => Kappa::<Test>::set(value as u16),
+            "max_allowed_validators" => {
+                MaxAllowedValidators::<Test>::insert(netuid, Some(value as u16))
+            }
+            "bonds_moving_average" => BondsMovingAverage::<Test>::insert(netuid, value),
+            "max_weight_age" => MaxWeightAge::<Test>::insert(netuid, value),
+            "alpha_low" => AlphaValues::<Test>::mutate(netuid, |(low, _)| *low = value as u16),
+            "alpha_high" => AlphaValues::<Test>::mutate(netuid, |(_, high)| *high = value as u16),
+            _ => panic!("unknown consensus param `{name}`"),
+        }
+    }
+}
+
+// BACKTEST_DATA=... BACKTEST_OUTPUT=... cargo test --package tests --features testing-offworker
+// test_backtest_consensus -- --ignored --nocapture
+#[test]
+#[ignore = "needs a crawled dataset, run through scripts/python/sweep.py"]
+fn test_backtest_consensus() {
+    let data_path = env::var("BACKTEST_DATA").expect("BACKTEST_DATA must be set");
+    let output_path = env::var("BACKTEST_OUTPUT").expect("BACKTEST_OUTPUT must be set");
+    let tempo = env::var("BACKTEST_TEMPO")
+        .map(|tempo| tempo.parse().expect("BACKTEST_TEMPO must be an integer"))
+        .unwrap_or(DEFAULT_TEMPO);
+    let params = env::var("BACKTEST_PARAMS").unwrap_or_default();
+
+    let data = load_msgpack_from(&PathBuf::from(data_path));
+
+    // Block numbers are string keys, sort them numerically
+    let mut blocks: Vec<(u64, _)> = data
+        .weights
+        .iter()
+        .filter_map(|(block, weights)| Some((block.parse::<u64>().ok()?, weights)))
+        .collect();
+    blocks.sort_unstable_by_key(|(block, _)| *block);
+
+    new_test_ext().execute_with(|| {
+        setup_subnet(TEST_SUBNET_ID, tempo);
+        register_modules_from_msgpack(&data, TEST_SUBNET_ID);
+        apply_consensus_param_overwrites(TEST_SUBNET_ID, &params);
+
+        let mut writer = csv::Writer::from_path(&output_path).expect("Failed to create output");
+        writer
+            .write_record(["block", "uid", "emission", "dividends"])
+            .expect("Failed to write output");
+
+        for (block_number, block_weights) in blocks {
+            System::set_block_number(block_number);
+            make_parameter_consensus_overwrites(TEST_SUBNET_ID, block_number, &data, None);
+
+            // The dataset holds a single subnet
+            let Some(weights) = block_weights.values().next() else {
+                continue;
+            };
+
+            let input_weights: Vec<(u16, Vec<(u16, u16)>)> = weights
+                .iter()
+                .filter_map(|(uid_str, weight_data)| {
+                    let uid = uid_str.parse::<u16>().ok()?;
+                    let weight_vec: Vec<(u16, u16)> = weight_data
+                        .iter()
+                        .filter(|w| w.len() == 2)
+                        .map(|w| (w[0] as u16, w[1] as u16))
+                        .collect();
+                    (!weight_vec.is_empty()).then_some((uid, weight_vec))
+                })
+                .collect();
+
+            let output = match ConsensusParams::<Test>::new(TEST_SUBNET_ID, PENDING_EMISSION)
+                .map_err(|e| format!("{e:?}"))
+                .and_then(|params| {
+                    YumaEpoch::<Test>::new(TEST_SUBNET_ID, params)
+                        .run(input_weights)
+                        .map_err(|e| format!("{e:?}"))
+                }) {
+                Ok(output) => output,
+                Err(e) => {
+                    log::error!("skipping epoch at block {block_number}: {e}");
+                    continue;
+                }
+            };
+
+            for (uid, (emission, dividends)) in
+                output.combined_emissions.iter().zip(&output.dividends).enumerate()
+            {
+                writer
+                    .write_record([
+                        block_number.to_string(),
+                        uid.to_string(),
+                        emission.to_string(),
+                        dividends.to_string(),
+                    ])
+                    .expect("Failed to write output");
+            }
+
+            output.apply();
+        }
+
+        writer.flush().expect("Failed to write output");
+    });
+}
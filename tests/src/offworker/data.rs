@@ -1,7 +1,12 @@
 use crate::mock::*;
 use pallet_subspace::{LastUpdate, RegistrationBlock};
 use serde::{Deserialize, Serialize};
-use std::{collections::BTreeMap, fs::File, io::Read, path::PathBuf};
+use std::{
+    collections::BTreeMap,
+    fs::File,
+    io::Read,
+    path::{Path, PathBuf},
+};
 
 #[derive(Serialize, Deserialize, Debug)]
 pub struct MsgPackValue {
@@ -14,7 +19,11 @@ pub struct MsgPackValue {
 pub fn load_msgpack_data() -> MsgPackValue {
     let mut path = PathBuf::from(env!("CARGO_MANIFEST_DIR"));
     path.push("src/data/sn31_sim.msgpack");
-    let mut file = File::open(path).expect("Failed to open sn31_sim.msgpack");
+    load_msgpack_from(&path)
+}
+
+pub fn load_msgpack_from(path: &Path) -> MsgPackValue {
+    let mut file = File::open(path).unwrap_or_else(|_| panic!("Failed to open {}", path.display()));
     let mut buffer = Vec::new();
     file.read_to_end(&mut buffer).expect("Failed to read file");
 
@@ -55,17 +64,21 @@ pub fn make_parameter_consensus_overwrites(
 
 fn get_value_for_block(module: &str, block_number: u64, data: &MsgPackValue) -> Vec<u64> {
     let block_str = block_number.to_string();
-    match module {
-        "last_update" => data
-            .last_update
-            .get(&block_str)
-            .map(|m| m.values().cloned().collect())
-            .unwrap_or_default(),
-        "registration_blocks" => data
-            .registration_blocks
-            .get(&block_str)
-            .map(|m| m.values().cloned().collect())
-            .unwrap_or_default(),
-        _ => Vec::new(),
-    }
+    let values = match module {
+        "last_update" => data.last_update.get(&block_str),
+        "registration_blocks" => data.registration_blocks.get(&block_str),
+        _ => None,
+    };
+
+    // Keys are uids as strings, order them numerically so entry `i` belongs to uid `i`
+    let mut by_uid: Vec<(u16, u64)> = values
+        .map(|m| {
+            m.iter()
+                .filter_map(|(uid_str, &value)| Some((uid_str.parse::<u16>().ok()?, value)))
+                .collect()
+        })
+        .unwrap_or_default();
+    by_uid.sort_unstable_by_key(|(uid, _)| *uid);
+
+    by_uid.into_iter().map(|(_, value)| value).collect()
 }
@@ -1,4 +1,6 @@
 #[cfg(feature = "testing-offworker")]
+mod backtest;
+#[cfg(feature = "testing-offworker")]
 mod data;
 // #[cfg(feature = "testing-offworker")]
 pub mod encryption;